@@ -1,13 +1,13 @@
 """Inky e-Ink Display Driver."""
+import functools
 import struct
 import time
 import warnings
-from datetime import timedelta
 
 import gpiod
 import gpiodevice
 import numpy
-from gpiod.line import Bias, Direction, Edge, Value
+from gpiod.line import Bias, Direction, Value
 from PIL import Image
 
 from . import eeprom
@@ -32,6 +32,12 @@ _SPI_CHUNK_SIZE = 4096
 _SPI_COMMAND = 0
 _SPI_DATA = 1
 
+# Set RAM X/Y Pointer Start, sent before writing each colour plane
+_RAM_POINTER_RESET = (
+    (0x4E, b"\x00"),
+    (0x4F, b"\x00\x00"),
+)
+
 _RESOLUTION = {
     (800, 480): (800, 480, 0),
     (600, 448): (600, 448, 0),
@@ -41,6 +47,31 @@ _RESOLUTION = {
 }
 
 
+@functools.lru_cache(maxsize=None)
+def _display_palette(colour):
+    """Return the display colours in colour index order, and a lookup table from luminance to colour index.
+
+    The display colours all have a distinct luminance, so an image drawn only in them maps to colour indexes
+    with a single lookup on its L channel. Levels come from Pillow itself so they match its own conversion.
+
+    :param str colour: One of "red", "black" or "yellow".
+    """
+    r, g, b = 0, 0, 0
+    if colour == "red":
+        r = 255
+    if colour == "yellow":
+        r = g = 255
+
+    palette = ((255, 255, 255), (0, 0, 0), (r, g, b))
+
+    levels = numpy.array(Image.fromarray(numpy.array([palette], dtype=numpy.uint8)).convert("L"))[0]
+    lut = [0] * 256
+    for index in reversed(range(len(palette))):
+        lut[levels[index]] = index
+
+    return palette, tuple(lut)
+
+
 class Inky:
     """Inky e-Ink Display Driver.
 
@@ -53,7 +84,7 @@ class Inky:
     YELLOW = 2
 
     def __init__(self, resolution=(400, 300), colour="black", cs_pin=CS0_PIN, dc_pin=DC_PIN, reset_pin=RESET_PIN, busy_pin=BUSY_PIN, h_flip=False, v_flip=False,
-                 spi_bus=None, i2c_bus=None, gpio=None):
+                 spi_bus=None, i2c_bus=None, gpio=None, max_speed_hz=4000000):
         """Initialise an Inky Display.
 
         :param resolution: Display resolution (width, height) in pixels, default: (400, 300).
@@ -70,8 +101,10 @@ class Inky:
         :param i2c_bus: SMB object. If `None` then :class:`smbus2.SMBus(1)` is used.
         :type i2c_bus: :class:`smbus2.SMBus`
         :param gpio: deprecated
+        :param int max_speed_hz: SPI bus speed in Hz, default: `4000000`.
         """
         self._spi_bus = spi_bus
+        self._spi_speed_hz = max_speed_hz
         self._i2c_bus = i2c_bus
 
         if resolution not in _RESOLUTION.keys():
@@ -81,6 +114,12 @@ class Inky:
         self.width, self.height = resolution
         self.cols, self.rows, self.rotation = _RESOLUTION[resolution]
 
+        # Resolution-dependent command arguments, these never change so pack them once
+        packed_height = struct.pack("<H", self.rows)
+        self._gate_setting = packed_height + b"\x00"
+        self._ram_x_range = bytes([0x00, (self.cols // 8) - 1])
+        self._ram_y_range = b"\x00\x00" + packed_height
+
         if colour not in ("red", "black", "yellow"):
             raise ValueError("Colour {} is not supported!".format(colour))
 
@@ -97,6 +136,12 @@ class Inky:
         self.buf = numpy.zeros((self.height, self.width), dtype=numpy.uint8)
         self.border_colour = 0
 
+        # Oriented buffer and colour planes are reused between frames, laid out as the panel's RAM
+        plane_shape = self.buf.shape if self.rotation % 180 == 0 else self.buf.shape[::-1]
+        self._region = numpy.empty(plane_shape, dtype=numpy.uint8)
+        self._plane_bw = numpy.empty(plane_shape, dtype=bool)
+        self._plane_red = numpy.empty(plane_shape, dtype=bool)
+
         self.dc_pin = dc_pin
         self.reset_pin = reset_pin
         self.busy_pin = busy_pin
@@ -111,6 +156,10 @@ class Inky:
         self._gpio = gpio
         self._gpio_setup = False
 
+        # Reusable single byte buffers for command bytes and single byte arguments
+        self._command_byte = bytearray(1)
+        self._data_byte = bytearray(1)
+
         """Inky Lookup Tables.
 
         These lookup tables comprise of two sets of values.
@@ -218,6 +267,7 @@ class Inky:
                 0x00, 0x00, 0x00, 0x00, 0x00,
             ]
         }
+        self._lut_bytes = {name: bytes(values) for name, values in self._luts.items()}
 
     def setup(self):
         """Set up Inky GPIO and reset display."""
@@ -240,7 +290,7 @@ class Inky:
                         self.cs_pin: gpiod.LineSettings(direction=Direction.OUTPUT, output_value=Value.ACTIVE, bias=Bias.DISABLED),
                         self.dc_pin: gpiod.LineSettings(direction=Direction.OUTPUT, output_value=Value.INACTIVE, bias=Bias.DISABLED),
                         self.reset_pin: gpiod.LineSettings(direction=Direction.OUTPUT, output_value=Value.ACTIVE, bias=Bias.DISABLED),
-                        self.busy_pin: gpiod.LineSettings(direction=Direction.INPUT, edge_detection=Edge.FALLING, bias=Bias.DISABLED)
+                        self.busy_pin: gpiod.LineSettings(direction=Direction.INPUT, bias=Bias.DISABLED)
                     })
 
             if self._spi_bus is None:
@@ -252,7 +302,7 @@ class Inky:
                 self._spi_bus.no_cs = True
             except OSError:
                 warnings.warn("SPI: Cannot disable chip-select!")
-            self._spi_bus.max_speed_hz = 488000
+            self._spi_bus.max_speed_hz = self._spi_speed_hz
 
             self._gpio_setup = True
 
@@ -266,12 +316,11 @@ class Inky:
 
     def _busy_wait(self, timeout=30.0):
         """Wait for busy/wait pin."""
-        if self._gpio.get_value(self.busy_pin) == Value.ACTIVE:
-            event = self._gpio.wait_edge_events(timedelta(seconds=timeout))
-            if not event:
+        deadline = time.monotonic() + timeout
+        while self._gpio.get_value(self.busy_pin) == Value.ACTIVE:
+            if time.monotonic() > deadline:
                 raise RuntimeError("Timeout waiting for busy signal to clear.")
-            for event in self._gpio.read_edge_events():
-                pass
+            time.sleep(0.01)
 
     def _update(self, buf_a, buf_b, busy_wait=True):
         """Update display.
@@ -282,55 +331,53 @@ class Inky:
         """
         self.setup()
 
-        packed_height = list(struct.pack("<H", self.rows))
-
-        if isinstance(packed_height[0], str):
-            packed_height = map(ord, packed_height)
+        commands = [
+            (0x74, 0x54),  # Set Analog Block Control
+            (0x7E, 0x3B),  # Set Digital Block Control
 
-        self._send_command(0x74, 0x54)  # Set Analog Block Control
-        self._send_command(0x7E, 0x3B)  # Set Digital Block Control
+            (0x01, self._gate_setting),  # Gate setting
 
-        self._send_command(0x01, packed_height + [0x00])  # Gate setting
+            (0x03, 0x17),  # Gate Driving Voltage
+            (0x04, b"\x41\xAC\x32"),  # Source Driving Voltage
 
-        self._send_command(0x03, 0x17)  # Gate Driving Voltage
-        self._send_command(0x04, [0x41, 0xAC, 0x32])  # Source Driving Voltage
+            (0x3A, 0x07),  # Dummy line period
+            (0x3B, 0x04),  # Gate line width
+            (0x11, 0x03),  # Data entry mode setting 0x03 = X/Y increment
 
-        self._send_command(0x3A, 0x07)  # Dummy line period
-        self._send_command(0x3B, 0x04)  # Gate line width
-        self._send_command(0x11, 0x03)  # Data entry mode setting 0x03 = X/Y increment
+            (0x2C, 0x3C),  # VCOM Register, 0x3c = -1.5v?
 
-        self._send_command(0x2C, 0x3C)  # VCOM Register, 0x3c = -1.5v?
+            (0x3C, 0b00000000),
+        ]
 
-        self._send_command(0x3C, 0b00000000)
         if self.border_colour == self.BLACK:
-            self._send_command(0x3C, 0b00000000)  # GS Transition Define A + VSS + LUT0
+            commands.append((0x3C, 0b00000000))  # GS Transition Define A + VSS + LUT0
         elif self.border_colour == self.RED and self.colour == "red":
-            self._send_command(0x3C, 0b01110011)  # Fix Level Define A + VSH2 + LUT3
+            commands.append((0x3C, 0b01110011))  # Fix Level Define A + VSH2 + LUT3
         elif self.border_colour == self.YELLOW and self.colour == "yellow":
-            self._send_command(0x3C, 0b00110011)  # GS Transition Define A + VSH2 + LUT3
+            commands.append((0x3C, 0b00110011))  # GS Transition Define A + VSH2 + LUT3
         elif self.border_colour == self.WHITE:
-            self._send_command(0x3C, 0b00110001)  # GS Transition Define A + VSH2 + LUT1
+            commands.append((0x3C, 0b00110001))  # GS Transition Define A + VSH2 + LUT1
 
         if self.colour == "yellow":
-            self._send_command(0x04, [0x07, 0xAC, 0x32])  # Set voltage of VSH and VSL
+            commands.append((0x04, b"\x07\xAC\x32"))  # Set voltage of VSH and VSL
         if self.colour == "red" and self.resolution == (400, 300):
-            self._send_command(0x04, [0x30, 0xAC, 0x22])
+            commands.append((0x04, b"\x30\xAC\x22"))
 
-        self._send_command(0x32, self._luts[self.lut])  # Set LUTs
+        commands.append((0x32, self._lut_bytes[self.lut]))  # Set LUTs
 
-        self._send_command(0x44, [0x00, (self.cols // 8) - 1])  # Set RAM X Start/End
-        self._send_command(0x45, [0x00, 0x00] + packed_height)  # Set RAM Y Start/End
+        commands.append((0x44, self._ram_x_range))  # Set RAM X Start/End
+        commands.append((0x45, self._ram_y_range))  # Set RAM Y Start/End
 
         # 0x24 == RAM B/W, 0x26 == RAM Red/Yellow/etc
         for data in ((0x24, buf_a), (0x26, buf_b)):
             cmd, buf = data
-            self._send_command(0x4E, 0x00)  # Set RAM X Pointer Start
-            self._send_command(0x4F, [0x00, 0x00])  # Set RAM Y Pointer Start
-            self._send_command(cmd, buf)
+            commands.extend(_RAM_POINTER_RESET)
+            commands.append((cmd, buf))
 
-        self._send_command(0x22, 0xC7)  # Display Update Sequence
-        self._send_command(0x20)  # Trigger Display Update
-        time.sleep(0.05)
+        commands.append((0x22, 0xC7))  # Display Update Sequence
+        commands.append((0x20, None))  # Trigger Display Update
+
+        self._send_commands(commands)
 
         if busy_wait:
             self._busy_wait()
@@ -344,13 +391,41 @@ class Inky:
         :param int v: Colour to set, valid values are `inky.BLACK`, `inky.WHITE`, `inky.RED` and `inky.YELLOW`.
         """
         if v in (WHITE, BLACK, RED):
-            self.buf[y][x] = v
+            self.buf[y, x] = v
+
+    def set_pixels(self, x, y, v):
+        """Set many pixels on the buffer at once.
+
+        Accepts arrays of positions and colours, which are broadcast against each other like any NumPy operation.
+
+        :param x: x positions on display.
+        :param y: y positions on display.
+        :param v: Colour(s) to set, valid values are `inky.BLACK`, `inky.WHITE`, `inky.RED` and `inky.YELLOW`.
+        """
+        x, y, v = numpy.broadcast_arrays(x, y, v)
+        valid = numpy.isin(v, (WHITE, BLACK, RED))
+        self.buf[y[valid], x[valid]] = v[valid]
 
     def show(self, busy_wait=True):
         """Show buffer on display.
 
         :param bool busy_wait: If True, wait for display update to finish before returning, default: `True`.
         """
+        plane_bw, plane_red = self._planes()
+
+        buf_a = numpy.packbits(plane_bw)
+        buf_b = numpy.packbits(plane_red)
+
+        self._update(buf_a, buf_b, busy_wait=busy_wait)
+
+    def _planes(self):
+        """Split the buffer into the panel's two one-bit colour planes.
+
+        The buffer is oriented to match the panel's RAM layout first.
+
+        :return: (B/W plane, Red/Yellow plane) boolean arrays, B/W is set for non-black pixels.
+                 Both are reused by the next call.
+        """
         region = self.buf
 
         if self.v_flip:
@@ -362,10 +437,13 @@ class Inky:
         if self.rotation:
             region = numpy.rot90(region, self.rotation // 90)
 
-        buf_a = numpy.packbits(numpy.where(region == BLACK, 0, 1)).tolist()
-        buf_b = numpy.packbits(numpy.where(region == RED, 1, 0)).tolist()
+        # The flips and rotation above are strided views, copy once so both planes are read from contiguous memory
+        numpy.copyto(self._region, region)
 
-        self._update(buf_a, buf_b, busy_wait=busy_wait)
+        numpy.not_equal(self._region, BLACK, out=self._plane_bw)
+        numpy.equal(self._region, RED, out=self._plane_red)
+
+        return self._plane_bw, self._plane_red
 
     def set_border(self, colour):
         """Set the border colour.
@@ -381,37 +459,37 @@ class Inky:
         image = image.resize((self.width, self.height))
 
         if not image.mode == "P":
-            palette_image = Image.new("P", (1, 1))
-            r, g, b = 0, 0, 0
-            if self.colour == "red":
-                r = 255
-            if self.colour == "yellow":
-                r = g = 255
-            palette_image.putpalette([255, 255, 255, 0, 0, 0, r, g, b] + [0, 0, 0] * 252)
-            image.load()
-            image = image.im.convert("P", True, palette_image.im)
-
-        canvas = Image.new("P", (self.rows, self.cols))
-        width, height = image.size
-        canvas.paste(image, (0, 0, width, height))
-        self.buf = numpy.array(canvas, dtype=numpy.uint8).reshape((self.cols, self.rows))
-
-    def _spi_write(self, dc, values):
-        """Write values over SPI.
-
-        :param dc: whether to write as data or command
-        :param values: list of values to write
+            palette, lut = _display_palette(self.colour)
+
+            # getcolors gives up as soon as it sees one colour too many, so photos bail out almost immediately
+            colours = image.getcolors(len(palette)) if image.mode == "RGB" else None
+
+            if colours is not None and all(colour in palette for _, colour in colours):
+                # Drawn only in the display colours, so no dithering needed
+                image = image.convert("L").point(lut)
+            else:
+                palette_image = Image.new("P", (1, 1))
+                palette_image.putpalette([value for rgb in palette for value in rgb] + [0, 0, 0] * 252)
+                if image.mode not in ("RGB", "L"):
+                    image = image.convert("RGB")
+                image = image.quantize(palette=palette_image, dither=Image.Dither.FLOYDSTEINBERG)
+
+        self.buf = numpy.array(image, dtype=numpy.uint8).reshape((self.height, self.width))
+
+    def _spi_transfer(self, values):
+        """Clock values out over SPI, leaving chip-select and data/command untouched.
+
+        :param values: list of values, or a bytes-like object such as a numpy.uint8 array, to write
         """
-        self._gpio.set_value(self.cs_pin, Value.INACTIVE)
-        self._gpio.set_value(self.dc_pin, Value.ACTIVE if dc else Value.INACTIVE)
         try:
-            self._spi_bus.xfer3(values)
+            self._spi_bus.writebytes2(values)
         except AttributeError:
+            # Older spidev without writebytes2 only takes lists of up to its buffer size
+            if not isinstance(values, list):
+                values = list(bytes(values))
             for x in range(((len(values) - 1) // _SPI_CHUNK_SIZE) + 1):
                 offset = x * _SPI_CHUNK_SIZE
-                self._spi_bus.xfer(values[offset : offset + _SPI_CHUNK_SIZE])
-
-        self._gpio.set_value(self.cs_pin, Value.ACTIVE)
+                self._spi_bus.writebytes(values[offset : offset + _SPI_CHUNK_SIZE])
 
     def _send_command(self, command, data=None):
         """Send command over SPI.
@@ -420,16 +498,29 @@ class Inky:
         :param data: optional list of values
 
         """
-        self._spi_write(_SPI_COMMAND, [command])
-        if data is not None:
-            self._send_data(data)
+        self._send_commands([(command, data)])
+
+    def _send_commands(self, commands):
+        """Send a sequence of commands over SPI within a single chip-select.
 
-    def _send_data(self, data):
-        """Send data over SPI.
+        Data/command is only toggled where the stream switches between command and data bytes.
 
-        :param data: list of values
+        :param commands: list of (command, data) tuples, data may be `None`
 
         """
-        if isinstance(data, int):
-            data = [data]
-        self._spi_write(_SPI_DATA, data)
+        self._gpio.set_value(self.cs_pin, Value.INACTIVE)
+        dc = None
+        for command, data in commands:
+            if dc != _SPI_COMMAND:
+                dc = _SPI_COMMAND
+                self._gpio.set_value(self.dc_pin, Value.INACTIVE)
+            self._command_byte[0] = command
+            self._spi_transfer(self._command_byte)
+            if data is not None:
+                if isinstance(data, int):
+                    self._data_byte[0] = data
+                    data = self._data_byte
+                dc = _SPI_DATA
+                self._gpio.set_value(self.dc_pin, Value.ACTIVE)
+                self._spi_transfer(data)
+        self._gpio.set_value(self.cs_pin, Value.ACTIVE)
@@ -247,8 +247,8 @@ class Inky:
         if self.rotation:
             region = numpy.rot90(region, self.rotation // 90)
 
-        buf_a = numpy.packbits(numpy.where(region == BLACK, 0, 1)).tolist()
-        buf_b = numpy.packbits(numpy.where(region == RED, 1, 0)).tolist()
+        buf_a = numpy.packbits(region != BLACK)
+        buf_b = numpy.packbits(region == RED)
 
         self._update(buf_a, buf_b, busy_wait=busy_wait)
 
@@ -279,15 +279,20 @@ class Inky:
         """Write values over SPI.
 
         :param dc: whether to write as data or command
-        :param values: list of values to write
+        :param values: list of values, or a numpy.uint8 array, to write
 
         """
         self._gpio.set_value(self.cs_pin, Value.INACTIVE)
         self._gpio.set_value(self.dc_pin, Value.ACTIVE if dc else Value.INACTIVE)
 
         try:
-            self._spi_bus.xfer3(values)
+            if isinstance(values, numpy.ndarray):
+                self._spi_bus.writebytes2(values)
+            else:
+                self._spi_bus.xfer3(values)
         except AttributeError:
+            if isinstance(values, numpy.ndarray):
+                values = values.tolist()
             for x in range(((len(values) - 1) // _SPI_CHUNK_SIZE) + 1):
                 offset = x * _SPI_CHUNK_SIZE
                 self._spi_bus.xfer(values[offset:offset + _SPI_CHUNK_SIZE])
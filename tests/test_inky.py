@@ -0,0 +1,189 @@
+"""Display driver tests for Inky."""
+
+import pytest
+
+
+def test_show_writes_packed_buffers(GPIO, spidev, smbus2):
+    """Test that show() hands packed framebuffers straight to writebytes2."""
+    import numpy
+
+    from inky import InkyWHAT
+
+    inky = InkyWHAT('red')
+    inky.set_pixel(0, 0, inky.BLACK)
+    inky.set_pixel(1, 0, inky.RED)
+    inky.show()
+
+    written = [args[0] for args, _ in spidev.SpiDev().writebytes2.call_args_list]
+    buf_a, buf_b = [values for values in written if isinstance(values, numpy.ndarray)]
+
+    assert bytes(inky._luts['red']) in written
+
+    assert len(buf_a) == len(buf_b) == 400 * 300 // 8
+    assert buf_a[0] == 0b01111111
+    assert buf_b[0] == 0b01000000
+
+
+def test_update_sends_single_command_stream(GPIO, spidev, smbus2):
+    """Test that _update() issues all of its commands in a single _send_commands call."""
+    from inky import InkyWHAT
+
+    inky = InkyWHAT('black')
+    inky.setup()
+
+    calls = []
+    inky._send_commands = calls.append
+    inky.show(busy_wait=False)
+
+    # _update() calls setup(), whose soft reset is sent on its own before the update stream
+    assert len(calls) == 2
+    assert calls[0] == [(0x12, None)]
+    commands = [command for command, _ in calls[1]]
+    assert commands[0] == 0x74
+    assert commands[-2:] == [0x22, 0x20]
+    assert commands.count(0x24) == commands.count(0x26) == 1
+
+
+def test_setup_spi_speed(GPIO, spidev, smbus2):
+    """Test that the SPI bus speed can be set at construction."""
+    from inky.inky import Inky
+
+    inky = Inky(max_speed_hz=1000000)
+    inky.setup()
+
+    assert spidev.SpiDev().max_speed_hz == 1000000
+
+
+def test_busy_wait_timeout(GPIO, spidev, smbus2):
+    """Test that _busy_wait() gives up if the busy pin never clears."""
+    from inky.inky import Inky, Value
+
+    inky = Inky()
+    inky.setup()
+    inky._gpio.get_value.return_value = Value.ACTIVE
+
+    with pytest.raises(RuntimeError):
+        inky._busy_wait(0.05)
+
+
+def test_planes(GPIO, spidev, smbus2):
+    """Test that _planes() splits the buffer into oriented B/W and Red/Yellow planes."""
+    from inky.inky import Inky
+
+    inky = Inky(h_flip=True)
+    inky.set_pixel(0, 0, inky.BLACK)
+    inky.set_pixel(1, 0, inky.RED)
+
+    plane_bw, plane_red = inky._planes()
+
+    assert plane_bw.shape == plane_red.shape == (300, 400)
+    assert not plane_bw[-1, 0] and plane_bw[-1, 1]
+    assert plane_red[-1, 1] and plane_red.sum() == 1
+
+
+def test_set_image_display_colours(GPIO, spidev, smbus2):
+    """Test that an RGB image drawn in the display colours maps straight to colour indexes."""
+    import numpy
+    from PIL import Image
+
+    from inky import InkyPHAT
+
+    inky = InkyPHAT('red')
+    colours = numpy.array([[255, 255, 255], [0, 0, 0], [255, 0, 0]], dtype=numpy.uint8)
+    indexes = numpy.arange(inky.WIDTH * inky.HEIGHT).reshape((inky.HEIGHT, inky.WIDTH)) % 3
+
+    inky.set_image(Image.fromarray(colours[indexes], "RGB"))
+
+    assert (inky.buf == indexes).all()
+
+
+def test_set_image_fills_buffer(GPIO, spidev, smbus2):
+    """Test that a palette-converted image covers the whole buffer."""
+    from PIL import Image
+
+    from inky import InkyWHAT
+
+    inky = InkyWHAT('red')
+    inky.set_image(Image.new("RGBA", (inky.WIDTH, inky.HEIGHT), (255, 0, 0, 255)))
+
+    assert inky.buf.shape == (inky.HEIGHT, inky.WIDTH)
+    assert (inky.buf == inky.RED).all()
+
+    inky.set_pixel(0, 0, inky.BLACK)
+    assert inky.buf[0, 0] == inky.BLACK
+
+
+def test_spi_transfer_without_writebytes2(GPIO, spidev, smbus2):
+    """Test that transfers fall back to chunked writebytes on an older spidev."""
+    import numpy
+
+    from inky.inky import _SPI_CHUNK_SIZE, Inky
+
+    inky = Inky()
+    inky.setup()
+    del inky._spi_bus.writebytes2
+
+    inky._spi_transfer(numpy.ones(_SPI_CHUNK_SIZE + 1, dtype=numpy.uint8))
+
+    chunks = [args[0] for args, _ in inky._spi_bus.writebytes.call_args_list]
+    assert [len(chunk) for chunk in chunks] == [_SPI_CHUNK_SIZE, 1]
+    assert chunks[0] == [1] * _SPI_CHUNK_SIZE
+
+
+def test_set_pixels(GPIO, spidev, smbus2):
+    """Test that set_pixels() matches set_pixel() and skips invalid colours."""
+    import numpy
+
+    from inky.inky import Inky
+
+    inky = Inky()
+    inky.set_pixels(numpy.arange(6), 0, [inky.BLACK, inky.RED, 7, inky.WHITE, 1.5, 1.0])
+    inky.set_pixel(0, 1, inky.RED)
+    inky.set_pixel(1, 1, 7)
+    inky.set_pixel(2, 1, 1.5)
+    inky.set_pixel(3, 1, None)
+    inky.set_pixel(4, 1, numpy.uint8(inky.BLACK))
+    inky.set_pixel(5, 1, 1.0)
+
+    assert inky.buf[0, :6].tolist() == [inky.BLACK, inky.RED, 0, inky.WHITE, 0, inky.BLACK]
+    assert inky.buf[1, :6].tolist() == [inky.RED, 0, 0, 0, inky.BLACK, inky.BLACK]
+
+
+@pytest.mark.parametrize('module', ['inky.inky_ssd1608', 'inky.inky_ssd1683'])
+def test_ssd16xx_show_writes_packed_buffers(GPIO, spidev, smbus2, monkeypatch, module):
+    """Test that the SSD1608/SSD1683 drivers hand packed framebuffers straight to writebytes2."""
+    import importlib
+
+    import numpy
+
+    driver = importlib.import_module(module)
+    monkeypatch.setattr(driver.time, 'sleep', lambda seconds: None)
+
+    inky = driver.Inky()
+    inky.show()
+
+    written = [args[0] for args, _ in spidev.SpiDev().writebytes2.call_args_list]
+    buf_a, buf_b = written
+
+    assert buf_a.dtype == buf_b.dtype == numpy.uint8
+    assert len(buf_a) == len(buf_b) == inky.cols * inky.rows // 8
+
+
+@pytest.mark.parametrize('module', ['inky.inky_ssd1608', 'inky.inky_ssd1683'])
+def test_ssd16xx_spi_write_without_writebytes2(GPIO, spidev, smbus2, monkeypatch, module):
+    """Test that the SSD1608/SSD1683 drivers fall back to chunked xfer on an older spidev."""
+    import importlib
+
+    driver = importlib.import_module(module)
+    monkeypatch.setattr(driver.time, 'sleep', lambda seconds: None)
+
+    inky = driver.Inky()
+    inky.setup()
+    del inky._spi_bus.writebytes2
+    inky.show()
+
+    chunks = [args[0] for args, _ in inky._spi_bus.xfer.call_args_list]
+
+    assert all(isinstance(chunk, list) for chunk in chunks)
+    assert max(len(chunk) for chunk in chunks) == driver._SPI_CHUNK_SIZE
+    assert sum(len(chunk) for chunk in chunks) == 2 * inky.cols * inky.rows // 8